@@ -1,17 +1,45 @@
+import os
 import time
+import random
+import shutil
 import boto3
-import pypdf
-import pdfrw
 import logging
 import tempfile
 import functools
+import importlib
 from io import BytesIO
-from fillpdf import fillpdfs
 from collections import defaultdict
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from s3transfer.manager import TransferManager
+from s3transfer.subscribers import BaseSubscriber
 from botocore.client import BaseClient
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from reportlab.pdfgen import canvas
 logger = logging.getLogger(__name__)
+TEXTRACT_MAX_RESULTS = 1000
+TEXTRACT_TERMINAL_STATUSES = ('SUCCEEDED', 'FAILED', 'PARTIAL_SUCCESS')
+PAGE_DICT_SIZE_ESTIMATE = 1024
+# The parallel download re-fetches the first multipart_threshold bytes
+# already read by the size probe; below this size that overhead dominates
+PARALLEL_DOWNLOAD_MIN_SIZE = 64 * 1024 * 1024
+
+
+# PDF libraries are imported inside the methods that use them to keep cold
+# starts cheap; LAMB_PRELOAD="pypdf,pdfrw,..." imports a handler's set eagerly
+PRELOAD_MODULES = {
+    'pypdf': 'pypdf',
+    'pdfrw': 'pdfrw',
+    'fillpdf': 'fillpdf.fillpdfs',
+    'reportlab': 'reportlab.pdfgen.canvas',
+}
+for _name in os.getenv("LAMB_PRELOAD", "").split(","):
+    _name = _name.strip()
+    if not _name:
+        continue
+    if _name not in PRELOAD_MODULES:
+        logger.warning(f"Ignoring unknown LAMB_PRELOAD entry: {_name}")
+        continue
+    importlib.import_module(PRELOAD_MODULES[_name])
 
 
 class PDFProcessingError(Exception):
@@ -39,17 +67,83 @@ def with_temp_files(func):
     return wrapper
 
 
+def _prealloc_bytesio(estimated: int) -> BytesIO:
+    """
+    Returns a BytesIO already grown to estimated bytes, positioned at 0
+    Callers truncate() after writing to drop any unused tail
+    """
+    buffer = BytesIO()
+    if estimated > 0:
+        buffer.seek(estimated - 1)
+        buffer.write(b'\0')
+        buffer.seek(0)
+    return buffer
+
+
+class _KnownObjectSubscriber(BaseSubscriber):
+    """
+    Hands the transfer manager an already known object size and ETag
+    so it skips its own HeadObject
+    """
+
+    def __init__(self, size: int, etag: str):
+        self.size = size
+        self.etag = etag
+
+    def on_queued(self, future, **kwargs):
+        future.meta.provide_transfer_size(self.size)
+        future.meta.provide_object_etag(self.etag)
+
+
 class LambPDF():
+    transfer_config = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=8,
+        use_threads=True,
+    )
+
     def __init__(
             self,
             s3_client: BaseClient | None = None,
             region: str | None = None,
-
+            textract_max_poll_delay: float = 8.0,
     ):
         self.s3_client: BaseClient = s3_client or boto3.client('s3')
         if not region:
             region = "us-east-2"
         self.region = region
+        self.textract_max_poll_delay = textract_max_poll_delay
+        self._textract_client: BaseClient | None = None
+        self._transfer_manager: TransferManager | None = None
+
+    @property
+    def textract_client(self) -> BaseClient:
+        """
+        Lazily creates and caches the Textract client
+        """
+        if self._textract_client is None:
+            self._textract_client = boto3.client(
+                'textract',
+                region_name=self.region,
+                config=Config(
+                    max_pool_connections=16,
+                    retries={'mode': 'adaptive'},
+                ),
+            )
+        return self._textract_client
+
+    @property
+    def transfer_manager(self) -> TransferManager:
+        """
+        Lazily creates and caches the S3 transfer manager
+        """
+        if self._transfer_manager is None:
+            self._transfer_manager = create_transfer_manager(
+                self.s3_client,
+                self.transfer_config
+            )
+        return self._transfer_manager
 
     def download_pdf_from_s3(
         self,
@@ -58,15 +152,59 @@ class LambPDF():
     ) -> BytesIO:
         """
         Downloads PDF from S3 and returns BytesIO
+        PDFs of PARALLEL_DOWNLOAD_MIN_SIZE or more use parallel ranged GETs
         """
+        threshold = self.transfer_config.multipart_threshold
         try:
-            response = self.s3_client.get_object(
-                Bucket=bucket_name,
-                Key=s3_key
-            )
-            return BytesIO(
-                response['Body'].read()
-            )
+            # The first GET doubles as the size probe, so PDFs under the
+            # threshold still take a single round-trip
+            try:
+                response = self.s3_client.get_object(
+                    Bucket=bucket_name,
+                    Key=s3_key,
+                    Range=f"bytes=0-{threshold - 1}"
+                )
+            except ClientError as e:
+                # zero-byte objects cannot satisfy a byte range
+                if e.response['Error']['Code'] != 'InvalidRange':
+                    raise
+                response = self.s3_client.get_object(
+                    Bucket=bucket_name,
+                    Key=s3_key
+                )
+            content_range = response.get('ContentRange')
+            size = int(content_range.rsplit('/', 1)[1]) if content_range \
+                else response['ContentLength']
+            if size <= threshold:
+                return BytesIO(
+                    response['Body'].read()
+                )
+
+            output_buffer = _prealloc_bytesio(size)
+            if size < PARALLEL_DOWNLOAD_MIN_SIZE:
+                # Keep the probe bytes and fetch only the remainder; the
+                # parallel path would re-download them
+                shutil.copyfileobj(response['Body'], output_buffer)
+                remainder = self.s3_client.get_object(
+                    Bucket=bucket_name,
+                    Key=s3_key,
+                    Range=f"bytes={threshold}-",
+                    IfMatch=response['ETag']
+                )
+                shutil.copyfileobj(remainder['Body'], output_buffer)
+                output_buffer.seek(0)
+                return output_buffer
+
+            response['Body'].close()
+            self.transfer_manager.download(
+                bucket_name,
+                s3_key,
+                output_buffer,
+                subscribers=[
+                    _KnownObjectSubscriber(size, response['ETag'])]
+            ).result()
+            output_buffer.seek(0)
+            return output_buffer
         except ClientError as e:
             logger.error(f"Failed to download PDF from S3: {e}")
             raise S3Error(
@@ -79,45 +217,120 @@ class LambPDF():
             pdf_buffer: BytesIO
     ) -> dict:
         """
-        Uploads PDF buffer to S3
+        Uploads PDF buffer to S3, multipart above transfer_config threshold
+        Returns the put_object response, or for multipart uploads the
+        head_object response of the uploaded object (ETag, VersionId, ...)
         """
         try:
-            return self.s3_client.put_object(
+            size = pdf_buffer.getbuffer().nbytes
+            pdf_buffer.seek(0)
+            if size < self.transfer_config.multipart_threshold:
+                return self.s3_client.put_object(
+                    Bucket=bucket_name,
+                    Key=s3_key,
+                    Body=pdf_buffer,
+                    ContentLength=size
+                )
+            self.transfer_manager.upload(
+                pdf_buffer,
+                bucket_name,
+                s3_key
+            ).result()
+            return self.s3_client.head_object(
                 Bucket=bucket_name,
-                Key=s3_key,
-                Body=pdf_buffer.getvalue()
+                Key=s3_key
             )
         except ClientError as e:
             logger.error(f"Failed to upload PDF to S3: {e}")
             raise S3Error(f"Failed to upload {s3_key} to {bucket_name}") from e
 
-    @with_temp_files
     def fill_pdf_form(
         self,
         template_buffer: BytesIO,
         data: dict,
         *,
-        temp_in: tempfile.NamedTemporaryFile,
-        temp_out: tempfile.NamedTemporaryFile,
+        annot_flatten: bool = False,
+    ) -> BytesIO:
+        """
+        Merges data to template_buffer form fields in memory via pypdf
+        and lets viewers render them through /NeedAppearances
+        annot_flatten (or LAMB_USE_FILLPDF) uses fillpdfs.write_fillable_pdf
+        On the pypdf path list values select multiple options and tuple
+        values are read as pypdf's (value, font, size); fillpdfs instead
+        joined tuples into '^'-separated strings
+        Returns BytesIO of the filled PDF
+        """
+        if annot_flatten or os.getenv("LAMB_USE_FILLPDF"):
+            return self._fill_pdf_form_fillpdfs(
+                template_buffer,
+                data,
+                annot_flatten=annot_flatten
+            )
+
+        import pypdf
+
+        try:
+            template_buffer.seek(0)
+            reader = pypdf.PdfReader(template_buffer)
+            writer = pypdf.PdfWriter(clone_from=reader)
+            writer.set_need_appearances_writer(True)
+            fields = reader.get_fields() or {}
+            values = {}
+            for key, value in data.items():
+                # lists (multi-select) and (value, font, size) tuples pass
+                # through; scalars are stringified like fillpdfs does
+                if isinstance(value, (list, tuple)):
+                    values[key] = value
+                    continue
+                value = str(value)
+                # fillpdfs takes bare button states ("Yes"), pypdf wants names
+                if fields.get(key, {}).get('/FT') == '/Btn' \
+                        and not value.startswith('/'):
+                    value = f"/{value}"
+                values[key] = value
+            for page in writer.pages:
+                if '/Annots' in page:
+                    writer.update_page_form_field_values(
+                        page,
+                        values,
+                        auto_regenerate=None
+                    )
+
+            output_buffer = BytesIO()
+            writer.write(output_buffer)
+            output_buffer.seek(0)
+            return output_buffer
+        except Exception as e:
+            logger.error(f"Failed to fill PDF form: {e}")
+            raise PDFProcessingError("Failed to fill PDF form") from e
+
+    def _fill_pdf_form_fillpdfs(
+        self,
+        template_buffer: BytesIO,
+        data: dict,
+        *,
         annot_flatten: bool = False,
     ) -> BytesIO:
         """
         Merges data to template_buffer form fields via fillpdfs.write_fillable_pdf
+        fillpdfs hands its paths straight to pdfrw, which also takes BytesIO
         Returns BytesIO of the filled PDF
         """
-        temp_in.write(
-            template_buffer.read()
-        )
-        temp_in.flush()
-        fillpdfs.write_fillable_pdf(
-            temp_in.name,
-            temp_out.name,
-            data,
-            flatten=annot_flatten
-        )
-        temp_out.seek(0)
-        output_buffer = BytesIO(temp_out.read())
-        return output_buffer
+        from fillpdf import fillpdfs
+        try:
+            template_buffer.seek(0)
+            output_buffer = BytesIO()
+            fillpdfs.write_fillable_pdf(
+                template_buffer,
+                output_buffer,
+                data,
+                flatten=annot_flatten
+            )
+            output_buffer.seek(0)
+            return output_buffer
+        except Exception as e:
+            logger.error(f"Failed to fill PDF form: {e}")
+            raise PDFProcessingError("Failed to fill PDF form") from e
 
     @with_temp_files
     def flatten_as_images(
@@ -132,9 +345,16 @@ class LambPDF():
         Flattens the input_buffer PDF as images
         Returns BytesIO of the flattened PDF
         """
-        temp_in.write(
-            input_buffer.read()
-        )
+        import pdfrw
+        import pypdf
+        from fillpdf import fillpdfs
+        input_buffer.seek(0)
+        if retain_x_scale:
+            original_pdf = pdfrw.PdfReader(input_buffer)
+            media_box = original_pdf.pages[0].inheritable.MediaBox
+            original_width = float(media_box[2]) - float(media_box[0])
+            input_buffer.seek(0)
+        shutil.copyfileobj(input_buffer, temp_in)
         temp_in.flush()
 
         fillpdfs.flatten_pdf(
@@ -142,9 +362,6 @@ class LambPDF():
 
         output_buffer = BytesIO()
         if retain_x_scale:
-            original_pdf = pypdf.PdfReader(temp_in.name)
-            original_page = original_pdf.pages[0]
-            original_width = float(original_page.mediabox.width)
             flattened_pdf = pypdf.PdfReader(temp_out.name)
             output_pdf = pypdf.PdfWriter()
             for page in flattened_pdf.pages:
@@ -156,7 +373,8 @@ class LambPDF():
             output_buffer.seek(0)
             return output_buffer
         temp_out.seek(0)
-        output_buffer.write(temp_out.read())
+        shutil.copyfileobj(temp_out, output_buffer)
+        output_buffer.seek(0)
         return output_buffer
 
     def append_blank_page(
@@ -167,6 +385,7 @@ class LambPDF():
         Adds a blank page to the end of input_buffer PDF
         Returns BytesIO of the PDF with a blank page
         """
+        import pdfrw
         try:
             reader = pdfrw.PdfReader(fdata=input_buffer.getvalue())
             if not reader.pages:
@@ -191,8 +410,10 @@ class LambPDF():
             writer.addpages(reader.pages)
             writer.addpage(blank_page)
 
-            output_buffer = BytesIO()
+            output_buffer = _prealloc_bytesio(
+                input_buffer.getbuffer().nbytes + 4096)
             writer.write(output_buffer)
+            output_buffer.truncate()
             output_buffer.seek(0)
             return output_buffer
 
@@ -208,21 +429,27 @@ class LambPDF():
         Merges list of PDFs into a single file
         Returns BytesIO of the merged PDF
         """
+        import pdfrw
         if not pdf_buffers:
             raise ValueError("At least one PDF buffer must be provided")
 
         try:
-            writer = pdfrw.PdfWriter()
+            nonempty_buffers = []
             for buffer in pdf_buffers:
                 if buffer.getbuffer().nbytes == 0:
                     logger.warning("Skipping empty PDF buffer in merge")
                     continue
+                nonempty_buffers.append(buffer)
 
+            writer = pdfrw.PdfWriter()
+            for buffer in nonempty_buffers:
                 reader = pdfrw.PdfReader(fdata=buffer.getvalue())
                 writer.addpages(reader.pages)
 
-            output_buffer = BytesIO()
+            output_buffer = _prealloc_bytesio(
+                sum(buffer.getbuffer().nbytes for buffer in nonempty_buffers))
             writer.write(output_buffer)
+            output_buffer.truncate()
             output_buffer.seek(0)
             return output_buffer
         except Exception as e:
@@ -238,6 +465,7 @@ class LambPDF():
         Duplicates pages in order of the input PDF
         Returns BytesIO of the PDF with duplicated pages
         """
+        import pdfrw
         if copies < 1:
             raise ValueError("Copies must be a positive integer")
 
@@ -245,11 +473,17 @@ class LambPDF():
             reader = pdfrw.PdfReader(fdata=pdf_buffer.getvalue())
             writer = pdfrw.PdfWriter()
 
+            # addpage wraps each page in a fresh /Page dict that points at
+            # the same /Contents and /Resources objects, and the writer emits
+            # each shared object once, so every copy only costs its page dict
             for _ in range(copies):
                 writer.addpages(reader.pages)
 
-            output_buffer = BytesIO()
+            output_buffer = _prealloc_bytesio(
+                pdf_buffer.getbuffer().nbytes
+                + PAGE_DICT_SIZE_ESTIMATE * copies * len(reader.pages))
             writer.write(output_buffer)
+            output_buffer.truncate()
             output_buffer.seek(0)
             return output_buffer
         except Exception as e:
@@ -261,6 +495,7 @@ class LambPDF():
         background_buffer: BytesIO,
         form_buffer: BytesIO,
     ) -> BytesIO:
+        import pdfrw
         try:
             background_pdf = pdfrw.PdfReader(
                 fdata=background_buffer.getvalue())
@@ -268,21 +503,26 @@ class LambPDF():
 
             for bg_page, form_page in zip(background_pdf.pages, form_pdf.pages):
                 if form_page.Annots:
-                    bg_page.Annots = (bg_page.Annots or []) + form_page.Annots
-
-            if hasattr(form_pdf.Root, 'AcroForm') and form_pdf.Root.AcroForm:
-                if not hasattr(background_pdf.Root, 'AcroForm') or not background_pdf.Root.AcroForm:
+                    # a fresh array per page; /Annots may be shared between
+                    # pages, so extending it in place would leak widgets
+                    bg_page.Annots = pdfrw.PdfArray(
+                        list(bg_page.Annots or []) + list(form_page.Annots))
+
+            form_acroform = form_pdf.Root.AcroForm
+            if form_acroform:
+                if not background_pdf.Root.AcroForm:
                     background_pdf.Root.AcroForm = pdfrw.PdfDict()
-                for key, value in form_pdf.Root.AcroForm.items():
-                    if key == 'Fields':
-                        if 'Fields' not in background_pdf.Root.AcroForm:
-                            background_pdf.Root.AcroForm['Fields'] = pdfrw.PdfArray(
-                            )
-                        background_pdf.Root.AcroForm['Fields'].extend(value)
-                    else:
-                        background_pdf.Root.AcroForm[key] = value
-                background_pdf.Root.AcroForm[pdfrw.PdfName(
-                    'NeedAppearances')] = pdfrw.PdfObject('true')
+                bg_acroform = background_pdf.Root.AcroForm
+                bg_acroform.update({
+                    key: value for key, value in form_acroform.items()
+                    if key != pdfrw.PdfName.Fields
+                })
+                form_fields = form_acroform.Fields or []
+                if bg_acroform.Fields is None:
+                    bg_acroform.Fields = pdfrw.PdfArray(form_fields)
+                else:
+                    bg_acroform.Fields.extend(form_fields)
+                bg_acroform.NeedAppearances = pdfrw.PdfObject('true')
 
             output_buffer = BytesIO()
             pdfrw.PdfWriter().write(output_buffer, background_pdf)
@@ -293,16 +533,51 @@ class LambPDF():
             logger.error(f"Failed to embed form annotations: {e}")
             raise PDFProcessingError("Failed to embed form annotations") from e
 
+    def _wait_for_textract_job(
+        self,
+        client: BaseClient,
+        job_id: str,
+        print_progress: bool = False,
+    ) -> dict:
+        """
+        Polls a text detection job with jittered exponential backoff
+        Returns the first terminal get_document_text_detection response
+        """
+        delay = 0.5
+        while True:
+            try:
+                status = client.get_document_text_detection(
+                    JobId=job_id,
+                    MaxResults=TEXTRACT_MAX_RESULTS
+                )
+            except ClientError as e:
+                logger.error(f"Failed to get Textract job status: {e}")
+                raise TextractError(
+                    f"Failed to get Textract job status for {job_id}") from e
+
+            job_status = status['JobStatus']
+            if job_status == 'FAILED':
+                logger.error(f"Textract job failed for {job_id}")
+                raise TextractError(f"Textract job failed for {job_id}")
+            if job_status == 'PARTIAL_SUCCESS':
+                logger.warning(f"Textract job partially succeeded for {job_id}")
+            if job_status in TEXTRACT_TERMINAL_STATUSES:
+                return status
+
+            if print_progress:
+                print(
+                    f"Waiting for job to complete... Current status: {job_status}"
+                )
+            time.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, self.textract_max_poll_delay)
+
     def textract_pdf_from_s3(
         self,
         bucket_name: str,
         s3_key: str,
         print_progress: bool = False,
     ) -> dict[int, list[dict]]:
-        client = boto3.client(
-            'textract',
-            region_name=self.region,
-        )
+        client = self.textract_client
         try:
             response = client.start_document_text_detection(
                 DocumentLocation={
@@ -319,53 +594,35 @@ class LambPDF():
 
         job_id = response['JobId']
         final_output_by_page = defaultdict(list)
-        next_token = None
 
         if print_progress:
             print(f"\nJob Started, ID: {job_id}")
             print("=" * 80)
+        status = self._wait_for_textract_job(client, job_id, print_progress)
+
+        # The terminal status response already carries the first page of
+        # results, so only follow-up pages are fetched
+        output = status
         while True:
-            try:
-                status = client.get_document_text_detection(JobId=job_id)
-            except ClientError as e:
-                logger.error(f"Failed to get Textract job status: {e}")
-                raise TextractError(
-                    f"Failed to get Textract job status for {job_id}") from e
+            for block in output.get('Blocks', []):
+                page_num = block.get('Page', 0)
+                final_output_by_page[page_num].append(block)
 
-            job_status = status['JobStatus']
-            if job_status in ['SUCCEEDED', 'FAILED']:
+            next_token = output.get('NextToken', None)
+            if not next_token:
                 break
 
-            if print_progress:
-                print(
-                    f"Waiting for job to complete... Current status: {job_status}"
-                )
-            time.sleep(5)
-
-        if job_status == 'FAILED':
-            logger.error(f"Textract job failed for {job_id}")
-            raise TextractError(f"Textract job failed for {job_id}")
-
-        while True:
-            response_kwargs = {'JobId': job_id}
-            if next_token:
-                response_kwargs['NextToken'] = next_token
-
             try:
-                output = client.get_document_text_detection(**response_kwargs)
+                output = client.get_document_text_detection(
+                    JobId=job_id,
+                    MaxResults=TEXTRACT_MAX_RESULTS,
+                    NextToken=next_token
+                )
             except ClientError as e:
                 logger.error(f"Failed to get Textract job output: {e}")
                 raise TextractError(
                     f"Failed to get Textract job output for {job_id}") from e
 
-            for block in output['Blocks']:
-                page_num = block.get('Page', 0)
-                final_output_by_page[page_num].append(block)
-
-            next_token = output.get('NextToken', None)
-            if not next_token:
-                break
-
         if print_progress:
             print("=" * 80)
             print("Textract Successful\n")
@@ -376,15 +633,22 @@ class LambPDF():
         self,
         input_buffer: BytesIO,
         blocks_by_page: dict[int, list[dict]]
-    ) -> None:
+    ) -> BytesIO:
+        """
+        Draws invisible Textract text over each page of input_buffer PDF
+        Returns BytesIO of the searchable PDF
+        """
+        import pypdf
+        from reportlab.pdfgen import canvas
         output_buffer = BytesIO()
         c = canvas.Canvas(output_buffer)
 
+        input_buffer.seek(0)
         pdf_reader = pypdf.PdfReader(input_buffer)
         pdf_writer = pypdf.PdfWriter()
 
         for i, page in enumerate(pdf_reader.pages):
-            print(f"Generating Page -> {i + 1}")
+            logger.debug(f"Generating Page -> {i + 1}")
 
             page_height = float(page.mediabox[-1])
             page_width = float(page.mediabox[-2])
@@ -394,25 +658,28 @@ class LambPDF():
 
             page_blocks = blocks_by_page.get(i + 1, [])
 
-            for block in page_blocks:
-                if block['BlockType'] in ['WORD', 'LINE']:
-                    x = block['Geometry']['BoundingBox']['Left'] * page_width
-                    y = page_height - \
-                        (block['Geometry']['BoundingBox']['Top'] * page_height)
-                    text = block['Text']
+            text_blocks = [
+                block for block in page_blocks
+                if block['BlockType'] in ['WORD', 'LINE']
+            ]
 
-                    x -= 2  # fine-tuning
-                    y -= 9  # fine-tuning
+            for block in text_blocks:
+                x = block['Geometry']['BoundingBox']['Left'] * page_width
+                y = page_height - \
+                    (block['Geometry']['BoundingBox']['Top'] * page_height)
 
-                    c.drawString(x, y, text)
+                x -= 2  # fine-tuning
+                y -= 9  # fine-tuning
+
+                c.drawString(x, y, block['Text'])
 
             c.showPage()
         c.save()
 
         overlay_reader = pypdf.PdfReader(output_buffer)
-        print("Merging original .pdf and overlay .pdf to final")
+        logger.debug("Merging original .pdf and overlay .pdf to final")
         for i, page in enumerate(pdf_reader.pages):
-            print(f"Merging Page -> {i + 1}")
+            logger.debug(f"Merging Page -> {i + 1}")
             overlay_page = overlay_reader.pages[i]
             page.merge_page(overlay_page)
             pdf_writer.add_page(page)
@@ -459,7 +726,7 @@ class LambPDF():
         annot_flatten: bool = False
     ) -> BytesIO:
         """
-        Merges data to template_buffer form fields via fillpdfs.write_fillable_pdf
+        Merges data to template_buffer form fields via fill_pdf_form
         Returns BytesIO of the filled PDF
         """
         return self.fill_pdf_form(